@@ -1,8 +1,14 @@
 import os
+import re
+import calendar
 import sqlite3
+import asyncio
 import logging
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, time, timedelta
 from pathlib import Path
+from time import monotonic
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
@@ -18,6 +24,10 @@ from telegram.ext import (
 # --- Настройка ---
 load_dotenv()
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
 DB_PATH = str(Path.home() / "telegram_bot_data" / "events.db")
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
@@ -42,43 +52,195 @@ logger = logging.getLogger(__name__)
     CONFIRM_DELETE,
 ) = range(10)
 
+# Соединение открывается в init_db, запросы идут через единственный поток DB_POOL
+CONN = None
+DB_LOCK = threading.Lock()
+DB_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+# --- SQL-запросы ---
+SQL_CREATE_EVENTS = """
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        datetime TEXT NOT NULL,
+        event_text TEXT NOT NULL,
+        file_id TEXT,
+        file_type TEXT,
+        file_name TEXT,
+        ts INTEGER NOT NULL
+    )"""
+# ts - unix-время для сортировки и диапазонов, datetime - только для показа
+SQL_CREATE_USER_TS_INDEX = "CREATE INDEX IF NOT EXISTS idx_user_ts ON events(user_id, ts)"
+SQL_ADD_TS_COLUMN = "ALTER TABLE events ADD COLUMN ts INTEGER NOT NULL DEFAULT 0"
+# "ДДММГГ ЧЧММ" -> "ДД.ММ.ГГГГ ЧЧ:ММ"; другие форматы migrate_ts приводит к этому
+SQL_TIME_DISPLAY = "substr(datetime, 8, 2) || ':' || substr(datetime, 10, 2)"
+SQL_DATETIME_DISPLAY = (
+    "substr(datetime, 1, 2) || '.' || substr(datetime, 3, 2) || '.20' || substr(datetime, 5, 2)"
+    f" || ' ' || {SQL_TIME_DISPLAY}"
+)
+SQL_INSERT_EVENT = """INSERT INTO events 
+    (user_id, datetime, ts, event_text, file_id, file_type, file_name) 
+    VALUES (?, ?, ?, ?, ?, ?, ?)"""
+SQL_SELECT_BY_USER = f"""SELECT id, {SQL_DATETIME_DISPLAY}, event_text, file_type, file_name 
+    FROM events WHERE user_id = ? ORDER BY ts"""
+SQL_SELECT_TODAY = f"""SELECT id, {SQL_TIME_DISPLAY}, event_text, file_type 
+    FROM events 
+    WHERE user_id = ? AND ts >= ? AND ts < ? 
+    ORDER BY ts"""
+SQL_SELECT_FILE = """SELECT file_id, file_type, file_name 
+    FROM events WHERE id = ? AND user_id = ?"""
+SQL_SELECT_USER_EVENT = """SELECT datetime, event_text, file_type 
+    FROM events WHERE id = ? AND user_id = ?"""
+SQL_SELECT_EVENT = f"""SELECT {SQL_DATETIME_DISPLAY}, event_text 
+    FROM events WHERE id = ? AND user_id = ?"""
+SQL_UPDATE_DATETIME = "UPDATE events SET datetime = ?, ts = ? WHERE id = ?"
+SQL_UPDATE_TEXT = "UPDATE events SET event_text = ? WHERE id = ?"
+SQL_UPDATE_FILE = "UPDATE events SET file_id = ?, file_type = ?, file_name = ? WHERE id = ?"
+SQL_REMOVE_FILE = "UPDATE events SET file_id = NULL, file_type = NULL, file_name = NULL WHERE id = ?"
+# RETURNING требует SQLite 3.35+; пустой результат - событие не найдено
+SQL_DELETE_EVENT = "DELETE FROM events WHERE id = ? AND user_id = ? RETURNING id"
+
 # --- Инициализация БД ---
 def init_db():
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                datetime TEXT NOT NULL,
-                event_text TEXT NOT NULL,
-                file_id TEXT,
-                file_type TEXT,
-                file_name TEXT
-            )"""
-        )
+    global CONN
+    CONN = sqlite3.connect(
+        DB_PATH,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=64,
+    )
+    CONN.executescript(
+        """
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA mmap_size=67108864;
+        """
+    )
+    CONN.execute(SQL_CREATE_EVENTS)
+    migrate_ts()
+    CONN.execute(SQL_CREATE_USER_TS_INDEX)
+
+# Форматы даты, встречающиеся в общей с v1.py БД
+LEGACY_DATETIME_FORMATS = ("%d%m%y %H%M", "%d.%m.%y %H:%M")
+
+def parse_stored_datetime(value):
+    if isinstance(value, int):
+        # v1.py одно время хранил unix-время по локальной зоне
+        return datetime.fromtimestamp(value)
+    for fmt in LEGACY_DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except (TypeError, ValueError):
+            pass
+    return None
+
+def migrate_ts():
+    # БД без ts: заполняем его и приводим datetime к "ДДММГГ ЧЧММ"
+    columns = [row[1] for row in CONN.execute("PRAGMA table_info(events)")]
+    if "ts" in columns:
+        return
+
+    updates, skipped = [], []
+    with CONN:
+        CONN.execute("BEGIN IMMEDIATE")
+        CONN.execute(SQL_ADD_TS_COLUMN)
+        for event_id, value in CONN.execute("SELECT id, datetime FROM events").fetchall():
+            dt = parse_stored_datetime(value)
+            if dt is None:
+                skipped.append(event_id)
+            else:
+                updates.append((format_datetime(dt), to_timestamp(dt), event_id))
+        CONN.executemany(SQL_UPDATE_DATETIME, updates)
+    logger.info(f"ts заполнен для {len(updates)} событий")
+    if skipped:
+        logger.warning(f"Дата не распознана, ts оставлен 0 для событий: {skipped}")
+
+# --- Работа с БД ---
+async def run_db(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(DB_POOL, func, *args)
+
+def _query_all(sql, params):
+    with DB_LOCK:
+        return CONN.execute(sql, params).fetchall()
+
+def _query_one(sql, params):
+    with DB_LOCK:
+        return CONN.execute(sql, params).fetchone()
+
+def _execute(sql, params):
+    with DB_LOCK:
+        CONN.execute(sql, params)
+
+def _execute_returning(sql, params):
+    # Оператор с RETURNING завершается (и фиксируется) только после чтения всех строк
+    with DB_LOCK:
+        return CONN.execute(sql, params).fetchall()
+
+# --- Кэш событий пользователя (только из event loop) ---
+USER_CACHE_TTL = 5
+_USER_CACHE = {}  # user_id -> (время загрузки по monotonic, события)
+
+async def get_user_events(user_id):
+    now = monotonic()
+    cached = _USER_CACHE.get(user_id)
+    if cached and now - cached[0] < USER_CACHE_TTL:
+        return cached[1]
+    events = await run_db(_query_all, SQL_SELECT_BY_USER, (user_id,))
+    for uid in [uid for uid, (stamp, _) in _USER_CACHE.items() if now - stamp >= USER_CACHE_TTL]:
+        del _USER_CACHE[uid]
+    _USER_CACHE[user_id] = (now, events)
+    return events
+
+async def get_user_event_titles(user_id):
+    return [(event_id, dt, text) for event_id, dt, text, _, _ in await get_user_events(user_id)]
+
+def invalidate_user_events(user_id):
+    _USER_CACHE.pop(user_id, None)
+
+# ДДММГГ ЧЧММ, только ASCII-цифры
+_DT_RE = re.compile(r"([0-9]{2})([0-9]{2})([0-9]{2}) ([0-9]{2})([0-9]{2})")
 
 def parse_datetime(datetime_str):
+    m = _DT_RE.fullmatch(datetime_str)
+    if not m:
+        return None
+    day, month, year, hour, minute = map(int, m.groups())
     try:
-        date_part, time_part = datetime_str.split()
-        day = int(date_part[:2])
-        month = int(date_part[2:4])
-        year = 2000 + int(date_part[4:6])
-        hour = int(time_part[:2])
-        minute = int(time_part[2:4])
-        return datetime(year, month, day, hour, minute)
-    except (ValueError, IndexError):
+        return datetime(2000 + year, month, day, hour, minute)
+    except ValueError:
         return None
 
 def format_datetime(dt):
     return dt.strftime("%d%m%y %H%M")
 
-def format_display_datetime(dt_str):
-    try:
-        dt = datetime.strptime(dt_str, "%d%m%y %H%M")
-        return dt.strftime("%d.%m.%Y %H:%M")
-    except ValueError:
-        return dt_str
+def to_timestamp(dt):
+    # Время, введённое пользователем, кодируется как UTC: не зависит от зоны хоста
+    return calendar.timegm(dt.timetuple())
+
+# Тип вложения -> (file_id, file_name), в порядке приоритета
+_FILE_KINDS = (
+    ("document", lambda m: (m.document.file_id, m.document.file_name) if m.document else None),
+    ("photo", lambda m: (m.photo[-1].file_id, None) if m.photo else None),
+    ("audio", lambda m: (m.audio.file_id, m.audio.file_name) if m.audio else None),
+    ("voice", lambda m: (m.voice.file_id, None) if m.voice else None),
+)
+
+def extract_file(message):
+    for file_type, extract in _FILE_KINDS:
+        found = extract(message)
+        if found:
+            return found[0], file_type, found[1]
+    return None, None, None
+
+def format_event_choices(header, events):
+    parts = [header, "\n\n"]
+    for event_id, dt, text in events:
+        parts.append(f"🆔 {event_id}\n⏰ {dt}: {text[:50]}")
+        if len(text) > 50:
+            parts.append("...")
+        parts.append("\n\n")
+    return "".join(parts)
 
 async def show_events_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
     events = context.user_data.get("events_list", [])
@@ -90,13 +252,14 @@ async def show_events_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
     end = start + per_page
     page_events = events[start:end]
 
-    message = f"📋 Ваши события (стр. {page+1}/{total_pages}):\n\n"
-    for event_id, dt, text, file_type, file_name in page_events:
-        message += f"🆔 {event_id}\n⏰ {format_display_datetime(dt)}: {text}\n"
+    lines = [f"📋 Ваши события (стр. {page+1}/{total_pages}):\n"]
+    for event_id, dt_display, text, file_type, file_name in page_events:
+        lines.append(f"🆔 {event_id}\n⏰ {dt_display}: {text}")
         if file_type:
             name = file_name if file_name else file_type
-            message += f"📎 Файл: {name}\n"
-        message += "\n"
+            lines.append(f"📎 Файл: {name}")
+        lines.append("")
+    message = "\n".join(lines)
 
     keyboard = []
     if len(events) > per_page:
@@ -158,6 +321,7 @@ async def get_datetime(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return GET_DATETIME
 
     context.user_data["datetime"] = format_datetime(dt)
+    context.user_data["ts"] = to_timestamp(dt)
     await update.message.reply_text("✏️ Введите описание события:")
     return GET_TEXT
 
@@ -169,22 +333,7 @@ async def get_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return GET_FILE
 
 async def get_file_attachment(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    file_id = file_type = file_name = None
-
-    if update.message.document:
-        file_id = update.message.document.file_id
-        file_type = "document"
-        file_name = update.message.document.file_name
-    elif update.message.photo:
-        file_id = update.message.photo[-1].file_id
-        file_type = "photo"
-    elif update.message.audio:
-        file_id = update.message.audio.file_id
-        file_type = "audio"
-        file_name = update.message.audio.file_name
-    elif update.message.voice:
-        file_id = update.message.voice.file_id
-        file_type = "voice"
+    file_id, file_type, file_name = extract_file(update.message)
 
     if file_id:
         await save_event(update, context, file_id, file_type, file_name)
@@ -201,31 +350,33 @@ async def skip_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 async def save_event(update: Update, context: ContextTypes.DEFAULT_TYPE, file_id=None, file_type=None, file_name=None):
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute(
-            """INSERT INTO events 
-            (user_id, datetime, event_text, file_id, file_type, file_name) 
-            VALUES (?, ?, ?, ?, ?, ?)""",
+    user_id = update.effective_user.id
+    try:
+        await run_db(
+            _execute,
+            SQL_INSERT_EVENT,
             (
-                update.effective_user.id,
+                user_id,
                 context.user_data["datetime"],
+                context.user_data["ts"],
                 context.user_data["text"],
                 file_id,
                 file_type,
                 file_name,
             ),
         )
+    except Exception as e:
+        logger.error(f"Ошибка при сохранении события: {e}")
+        await update.message.reply_text("⚠️ Не удалось сохранить событие, попробуйте ещё раз")
+        return
+    finally:
+        invalidate_user_events(user_id)
+
     msg = "✅ Событие сохранено!" + (" С файлом!" if file_id else "")
     await update.message.reply_text(msg)
 
 async def list_events(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.execute(
-            """SELECT id, datetime, event_text, file_type, file_name 
-            FROM events WHERE user_id = ? ORDER BY datetime""",
-            (update.effective_user.id,),
-        )
-        events = cursor.fetchall()
+    events = await get_user_events(update.effective_user.id)
 
     if not events:
         await update.message.reply_text("📭 Нет сохраненных событий")
@@ -236,31 +387,27 @@ async def list_events(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await show_events_page(update, context)
 
 async def today_events(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    today = datetime.now().strftime("%d%m%y")
-
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.execute(
-            """SELECT id, datetime, event_text, file_type 
-            FROM events 
-            WHERE user_id = ? AND datetime LIKE ? 
-            ORDER BY datetime""",
-            (update.effective_user.id, f"{today}%"),
-        )
-        events = cursor.fetchall()
+    day_start = datetime.combine(date.today(), time.min)
+    day_end = day_start + timedelta(days=1)
+
+    events = await run_db(
+        _query_all,
+        SQL_SELECT_TODAY,
+        (update.effective_user.id, to_timestamp(day_start), to_timestamp(day_end)),
+    )
 
     if not events:
         await update.message.reply_text(f"📭 Нет событий на сегодня ({datetime.now().strftime('%d.%m.%Y')})")
         return
 
-    message = f"📅 События на сегодня ({datetime.now().strftime('%d.%m.%Y')}):\n\n"
-    for event_id, dt, text, file_type in events:
-        time_str = format_display_datetime(dt).split()[1] if ' ' in dt else dt
-        message += f"🆔 {event_id}\n⏰ {time_str}: {text}\n"
+    lines = [f"📅 События на сегодня ({datetime.now().strftime('%d.%m.%Y')}):\n"]
+    for event_id, time_str, text, file_type in events:
+        lines.append(f"🆔 {event_id}\n⏰ {time_str}: {text}")
         if file_type:
-            message += f"📎 Есть файл\n"
-        message += "\n"
+            lines.append("📎 Есть файл")
+        lines.append("")
 
-    await update.message.reply_text(message)
+    await update.message.reply_text("\n".join(lines))
 
 async def request_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Введите ID события для скачивания файла:")
@@ -270,13 +417,7 @@ async def get_event_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         event_id = int(update.message.text)
 
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.execute(
-                """SELECT file_id, file_type, file_name 
-                FROM events WHERE id = ? AND user_id = ?""",
-                (event_id, update.effective_user.id),
-            )
-            file = cursor.fetchone()
+        file = await run_db(_query_one, SQL_SELECT_FILE, (event_id, update.effective_user.id))
 
         if not file:
             await update.message.reply_text("❌ Файл не найден")
@@ -310,25 +451,15 @@ async def handle_file_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
     return GET_EVENT_ID
 
 async def edit_event(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.execute(
-            "SELECT id, datetime, event_text FROM events WHERE user_id = ? ORDER BY datetime",
-            (update.effective_user.id,),
-        )
-        events = cursor.fetchall()
+    events = await get_user_event_titles(update.effective_user.id)
 
     if not events:
         await update.message.reply_text("📭 Нет событий для редактирования")
         return ConversationHandler.END
 
-    message = "📝 Выберите событие для редактирования (введите ID):\n\n"
-    for event_id, dt, text in events:
-        message += f"🆔 {event_id}\n⏰ {format_display_datetime(dt)}: {text[:50]}"
-        if len(text) > 50:
-            message += "..."
-        message += "\n\n"
-
-    await update.message.reply_text(message)
+    await update.message.reply_text(
+        format_event_choices("📝 Выберите событие для редактирования (введите ID):", events)
+    )
     return GET_EDIT_ID
 
 async def get_edit_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -336,13 +467,7 @@ async def get_edit_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
         event_id = int(update.message.text)
         context.user_data["edit_id"] = event_id
 
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.execute(
-                """SELECT datetime, event_text, file_type 
-                FROM events WHERE id = ? AND user_id = ?""",
-                (event_id, update.effective_user.id),
-            )
-            event = cursor.fetchone()
+        event = await run_db(_query_one, SQL_SELECT_USER_EVENT, (event_id, update.effective_user.id))
 
         if not event:
             await update.message.reply_text("❌ Событие не найдено")
@@ -396,11 +521,8 @@ async def edit_datetime(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     event_id = context.user_data["edit_id"]
 
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute(
-            "UPDATE events SET datetime = ? WHERE id = ?",
-            (format_datetime(dt), event_id),
-        )
+    await run_db(_execute, SQL_UPDATE_DATETIME, (format_datetime(dt), to_timestamp(dt), event_id))
+    invalidate_user_events(update.effective_user.id)
 
     await update.message.reply_text("✅ Дата события обновлена!")
     return ConversationHandler.END
@@ -409,40 +531,19 @@ async def edit_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     new_text = update.message.text
     event_id = context.user_data["edit_id"]
 
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute(
-            "UPDATE events SET event_text = ? WHERE id = ?",
-            (new_text, event_id),
-        )
+    await run_db(_execute, SQL_UPDATE_TEXT, (new_text, event_id))
+    invalidate_user_events(update.effective_user.id)
 
     await update.message.reply_text("✅ Текст события обновлен!")
     return ConversationHandler.END
 
 async def edit_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
     event_id = context.user_data["edit_id"]
-    file_id = file_type = file_name = None
-
-    if update.message.document:
-        file_id = update.message.document.file_id
-        file_type = "document"
-        file_name = update.message.document.file_name
-    elif update.message.photo:
-        file_id = update.message.photo[-1].file_id
-        file_type = "photo"
-    elif update.message.audio:
-        file_id = update.message.audio.file_id
-        file_type = "audio"
-        file_name = update.message.audio.file_name
-    elif update.message.voice:
-        file_id = update.message.voice.file_id
-        file_type = "voice"
+    file_id, file_type, file_name = extract_file(update.message)
 
     if file_id:
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.execute(
-                "UPDATE events SET file_id = ?, file_type = ?, file_name = ? WHERE id = ?",
-                (file_id, file_type, file_name, event_id),
-            )
+        await run_db(_execute, SQL_UPDATE_FILE, (file_id, file_type, file_name, event_id))
+        invalidate_user_events(update.effective_user.id)
         await update.message.reply_text("✅ Файл события обновлен!")
     else:
         await update.message.reply_text(
@@ -455,83 +556,87 @@ async def edit_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def remove_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
     event_id = context.user_data["edit_id"]
 
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute(
-            "UPDATE events SET file_id = NULL, file_type = NULL, file_name = NULL WHERE id = ?",
-            (event_id,),
-        )
+    await run_db(_execute, SQL_REMOVE_FILE, (event_id,))
+    invalidate_user_events(update.effective_user.id)
 
     await update.message.reply_text("✅ Файл удален из события!")
     return ConversationHandler.END
 
 async def delete_event(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.execute(
-            "SELECT id, datetime, event_text FROM events WHERE user_id = ? ORDER BY datetime",
-            (update.effective_user.id,),
-        )
-        events = cursor.fetchall()
+    events = await get_user_event_titles(update.effective_user.id)
 
     if not events:
         await update.message.reply_text("📭 Нет событий для удаления")
         return ConversationHandler.END
 
-    message = "❌ Выберите событие для удаления (введите ID):\n\n"
-    for event_id, dt, text in events:
-        message += f"🆔 {event_id}\n⏰ {format_display_datetime(dt)}: {text[:50]}"
-        if len(text) > 50:
-            message += "..."
-        message += "\n\n"
-
-    await update.message.reply_text(message)
+    await update.message.reply_text(
+        format_event_choices("❌ Выберите событие для удаления (введите ID):", events)
+    )
     return GET_EDIT_ID
 
 async def confirm_delete(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    event_id = context.user_data["edit_id"]
+    try:
+        event_id = int(update.message.text)
+    except ValueError:
+        await update.message.reply_text("❌ Введите числовой ID события")
+        return GET_EDIT_ID
 
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.execute(
-            "SELECT datetime, event_text FROM events WHERE id = ?", (event_id,)
-        )
-        dt, text = cursor.fetchone()
+    event = await run_db(_query_one, SQL_SELECT_EVENT, (event_id, update.effective_user.id))
+    if not event:
+        await update.message.reply_text("❌ Событие не найдено")
+        return ConversationHandler.END
 
-        keyboard = [
-            [InlineKeyboardButton("✅ Да, удалить", callback_data=f"confirm_del_{event_id}")],
-            [InlineKeyboardButton("❌ Нет, отменить", callback_data="cancel_del")]
-        ]
+    dt, text = event
+    context.user_data["pending_delete"] = (event_id, dt, text)
 
-        await update.message.reply_text(
-            f"Вы уверены, что хотите удалить это событие?\n\n"
-            f"🆔 {event_id}\n⏰ {format_display_datetime(dt)}: {text}",
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
-    return ConversationHandler.END
+    keyboard = [
+        [InlineKeyboardButton("✅ Да, удалить", callback_data=f"confirm_del_{event_id}")],
+        [InlineKeyboardButton("❌ Нет, отменить", callback_data="cancel_del")]
+    ]
+
+    await update.message.reply_text(
+        f"Вы уверены, что хотите удалить это событие?\n\n"
+        f"🆔 {event_id}\n⏰ {dt}: {text}",
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+    return CONFIRM_DELETE
 
 async def handle_confirm_delete(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
+    pending = context.user_data.get("pending_delete")
 
     if query.data.startswith("confirm_del_"):
         event_id = int(query.data.split("_")[2])
-        
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.execute(
-                "SELECT datetime, event_text FROM events WHERE id = ?", (event_id,)
+        # Кнопка со старого сообщения: удаляем только то, что показали последним
+        if not pending or pending[0] != event_id:
+            await query.edit_message_text(
+                text="⌛ Запрос на удаление устарел, повторите /delete",
+                reply_markup=None
             )
-            dt, text = cursor.fetchone()
+            return CONFIRM_DELETE if pending else ConversationHandler.END
+
+        del context.user_data["pending_delete"]
+        user_id = update.effective_user.id
 
-            conn.execute("DELETE FROM events WHERE id = ?", (event_id,))
-            conn.commit()
+        deleted = await run_db(_execute_returning, SQL_DELETE_EVENT, (event_id, user_id))
+        if not deleted:
+            await query.edit_message_text(text="❌ Событие не найдено", reply_markup=None)
+            return ConversationHandler.END
 
+        invalidate_user_events(user_id)
+        _, dt, text = pending
         await query.edit_message_text(
-            text=f"🗑️ Событие удалено:\n⏰ {format_display_datetime(dt)}: {text}",
+            text=f"🗑️ Событие удалено:\n⏰ {dt}: {text}",
             reply_markup=None
         )
     else:
+        context.user_data.pop("pending_delete", None)
         await query.edit_message_text(
             text="❌ Удаление отменено",
             reply_markup=None
         )
+    return ConversationHandler.END
 
 async def handle_pagination(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -547,6 +652,9 @@ async def handle_pagination(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await show_events_page(update, context)
 
 def main():
+    if WEBHOOK_URL and not WEBHOOK_SECRET:
+        raise SystemExit("WEBHOOK_SECRET обязателен, если задан WEBHOOK_URL")
+
     init_db()
 
     app = Application.builder().token(TOKEN).build()
@@ -601,7 +709,7 @@ def main():
     conv_handler_delete = ConversationHandler(
         entry_points=[CommandHandler("delete", delete_event)],
         states={
-            GET_EDIT_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_edit_id)],
+            GET_EDIT_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, confirm_delete)],
             CONFIRM_DELETE: [CallbackQueryHandler(handle_confirm_delete, pattern="^(confirm_del_|cancel_del)")],
         },
         fallbacks=[],
@@ -616,7 +724,16 @@ def main():
     app.add_handler(conv_handler_delete)
     app.add_handler(CallbackQueryHandler(handle_pagination, pattern="^(prev_page|next_page)$"))
 
-    app.run_polling()
+    if WEBHOOK_URL:
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=TOKEN,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{TOKEN}",
+            secret_token=WEBHOOK_SECRET,
+        )
+    else:
+        app.run_polling()
 
 if __name__ == "__main__":
     main()
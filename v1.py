@@ -1,7 +1,14 @@
 import os
+import re
+import calendar
+import asyncio
 import sqlite3
 import logging
-from datetime import datetime
+import threading
+from itertools import groupby
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
@@ -16,14 +23,10 @@ from telegram.ext import (
 )
 
 # --- Настройка ---
-load_dotenv()
-TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-DB_PATH = str(Path.home() / "telegram_bot_data" / "events.db")
-os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
 # Настройка логирования
 logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    format='%(created).3f - %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO
 )
 logger = logging.getLogger(__name__)
@@ -31,19 +34,277 @@ logger = logging.getLogger(__name__)
 # Состояния ConversationHandler
 GET_DATETIME, GET_TEXT, GET_FILE, GET_EVENT_ID = range(4)
 
+# Формат ввода и показа; сортировка и показ в БД идут по ts (unix-время)
+DATETIME_FORMAT = "%d.%m.%y %H:%M"
+# Формат колонки datetime - БД общая с event_bot.py
+DB_DATETIME_FORMAT = "%d%m%y %H%M"
+
+CONN = None
+DB_LOCK = threading.Lock()
+DB_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+# Изменения (SQL, параметры) пишутся пачкой: по размеру или по таймауту
+WRITE_BATCH_SIZE = 1000
+WRITE_BATCH_DELAY = 0.1
+
+# Не больше событий на странице /list; страница кончается раньше, если текст
+# не помещается в сообщение Telegram (MESSAGE_LIMIT в UTF-16, как считает Telegram)
+EVENTS_PAGE_SIZE = 20
+MESSAGE_LIMIT = 4096
+# Длина текста одного события, если оно само по себе не помещается в сообщение
+LONG_TEXT_CUT = 1500
+# Кнопок на одной странице /delete (Telegram допускает не более 100 кнопок)
+DELETE_PAGE_SIZE = 50
+FETCH_CHUNK_SIZE = 200
+
+# --- SQL-запросы ---
+SQL_CREATE_EVENTS = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    datetime TEXT NOT NULL,
+    event_text TEXT NOT NULL,
+    file_id TEXT,
+    file_type TEXT,
+    file_name TEXT,
+    ts INTEGER NOT NULL
+)"""
+SQL_CREATE_USER_TS_INDEX = "CREATE INDEX IF NOT EXISTS idx_user_ts ON events(user_id, ts)"
+SQL_ADD_TS_COLUMN = "ALTER TABLE events ADD COLUMN ts INTEGER NOT NULL DEFAULT 0"
+SQL_SET_DATETIME = "UPDATE events SET datetime = ?, ts = ? WHERE id = ?"
+SQL_INSERT_EVENT = """INSERT INTO events 
+(user_id, datetime, ts, event_text, file_id, file_type, file_name) 
+VALUES (?, ?, ?, ?, ?, ?, ?)"""
+SQL_LIST_EVENTS = """SELECT id, ts, event_text, file_type, file_name 
+FROM events WHERE user_id = ? ORDER BY ts LIMIT ? OFFSET ?"""
+SQL_GET_FILE = """SELECT file_id, file_type, file_name 
+FROM events WHERE id = ? AND user_id = ?"""
+SQL_LIST_EVENT_TITLES = """SELECT id, ts, event_text 
+FROM events WHERE user_id = ? ORDER BY ts LIMIT ? OFFSET ?"""
+SQL_GET_EVENT = "SELECT ts, event_text FROM events WHERE id = ? AND user_id = ?"
+SQL_DELETE_EVENT = "DELETE FROM events WHERE id = ? AND user_id = ?"
+
 # --- Инициализация БД ---
-def init_db():
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            datetime TEXT NOT NULL,
-            event_text TEXT NOT NULL,
-            file_id TEXT,
-            file_type TEXT,
-            file_name TEXT
-        )""")
+def init_db(db_path):
+    global CONN
+    CONN = sqlite3.connect(
+        db_path,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=256
+    )
+    CONN.executescript("""
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    """)
+    CONN.execute(SQL_CREATE_EVENTS)
+    migrate_ts()
+    CONN.execute(SQL_CREATE_USER_TS_INDEX)
+
+def parse_stored_datetime(value):
+    # Строки v1 и event_bot.py; целое - unix-время по локальной зоне из старой миграции v1
+    if isinstance(value, int):
+        return datetime.fromtimestamp(value)
+    for fmt in (DB_DATETIME_FORMAT, DATETIME_FORMAT):
+        try:
+            return datetime.strptime(value, fmt)
+        except (TypeError, ValueError):
+            pass
+    return None
+
+def migrate_ts():
+    # Добавляем ts и приводим datetime к общему с event_bot.py формату;
+    # нераспознанные строки пропускаются, а не прерывают запуск
+    columns = [name for _, name, *_ in CONN.execute("PRAGMA table_info(events)")]
+    if "ts" in columns:
+        return
+    
+    rows_updated = []
+    skipped = []
+    with CONN:
+        CONN.execute("BEGIN IMMEDIATE")
+        CONN.execute(SQL_ADD_TS_COLUMN)
+        for event_id, value in CONN.execute("SELECT id, datetime FROM events").fetchall():
+            dt = parse_stored_datetime(value)
+            if dt is None:
+                skipped.append(event_id)
+                continue
+            rows_updated.append((dt.strftime(DB_DATETIME_FORMAT), to_timestamp(dt), event_id))
+        CONN.executemany(SQL_SET_DATETIME, rows_updated)
+    logger.info(f"Добавлен ts для {len(rows_updated)} событий")
+    if skipped:
+        logger.warning(f"Не удалось разобрать дату событий {skipped}, ts = 0")
+
+# ДД.ММ.ГГ ЧЧ:ММ, только ASCII-цифры
+_DT_RE = re.compile(r"([0-9]{2})\.([0-9]{2})\.([0-9]{2}) ([0-9]{2}):([0-9]{2})")
+
+def parse_datetime(datetime_str):
+    m = _DT_RE.fullmatch(datetime_str)
+    if not m:
+        return None
+    day, month, year, hour, minute = map(int, m.groups())
+    try:
+        return datetime(2000 + year, month, day, hour, minute)
+    except ValueError:
+        return None
+
+# Введённое время хранится как UTC, чтобы не зависеть от часового пояса хоста
+def to_timestamp(dt):
+    return calendar.timegm(dt.timetuple())
+
+def format_timestamp(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime(DATETIME_FORMAT)
+
+def close_db():
+    with DB_LOCK:
+        CONN.close()
+
+# --- Запросы к БД (выполняются в DB_POOL) ---
+async def run_db(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(DB_POOL, func, *args)
+
+def _write_batch(batch):
+    # Подряд идущие одинаковые запросы - одним executemany
+    with DB_LOCK, CONN:
+        CONN.execute("BEGIN IMMEDIATE")
+        for sql, group in groupby(batch, key=itemgetter(0)):
+            CONN.executemany(sql, [params for _, params in group])
+
+def _message_len(text):
+    return len(text.encode('utf-16-le')) // 2
+
+def _format_list_entry(event_id, ts, text, file_type, file_name):
+    entry = f"🆔 {event_id}\n⏰ {format_timestamp(ts)}: {text}\n"
+    if file_type:
+        name = file_name if file_name else file_type
+        entry += f"📎 Файл: {name}\n"
+    return entry + "\n"
+
+def _render_events_page(user_id, offset):
+    # Возвращает текст страницы, число показанных событий и есть ли ещё
+    header = "📋 Ваши события:\n\n"
+    parts = [header]
+    length = _message_len(header)
+    shown = 0
+    has_more = False
+    with DB_LOCK:
+        cursor = CONN.execute(
+            SQL_LIST_EVENTS,
+            (user_id, EVENTS_PAGE_SIZE + 1, offset)
+        )
+        cursor.arraysize = FETCH_CHUNK_SIZE
+        while not has_more and (chunk := cursor.fetchmany()):
+            for event_id, ts, text, file_type, file_name in chunk:
+                entry = _format_list_entry(event_id, ts, text, file_type, file_name)
+                entry_len = _message_len(entry)
+                if shown == 0 and length + entry_len > MESSAGE_LIMIT:
+                    entry = _format_list_entry(
+                        event_id, ts, text[:LONG_TEXT_CUT] + "…", file_type, file_name
+                    )
+                    entry_len = _message_len(entry)
+                elif shown == EVENTS_PAGE_SIZE or length + entry_len > MESSAGE_LIMIT:
+                    has_more = True
+                    break
+                parts.append(entry)
+                length += entry_len
+                shown += 1
+    
+    if shown == 0:
+        return None, 0, False
+    return "".join(parts), shown, has_more
+
+def _select_file(event_id, user_id):
+    with DB_LOCK:
+        cursor = CONN.execute(SQL_GET_FILE, (event_id, user_id))
+        return cursor.fetchone()
+
+def _select_delete_page(user_id, offset):
+    with DB_LOCK:
+        cursor = CONN.execute(
+            SQL_LIST_EVENT_TITLES,
+            (user_id, DELETE_PAGE_SIZE + 1, offset)
+        )
+        events = {event_id: (dt, text) for event_id, dt, text in cursor}
+    
+    has_more = len(events) > DELETE_PAGE_SIZE
+    if has_more:
+        events.popitem()
+    return events, has_more
+
+def _select_event(event_id, user_id):
+    with DB_LOCK:
+        return CONN.execute(SQL_GET_EVENT, (event_id, user_id)).fetchone()
+
+# --- Пакетная запись ---
+async def flush_writes(batch):
+    # Если пачка не записалась, пишем по одному; возвращает незаписанные
+    try:
+        await run_db(_write_batch, batch)
+        return []
+    except Exception as e:
+        logger.warning(f"Пачка из {len(batch)} изменений не записана ({e}), пишем по одному")
+    
+    failed = []
+    for item in batch:
+        try:
+            await run_db(_write_batch, [item])
+        except Exception as e:
+            sql, params = item
+            logger.error(f"Изменение не записано: {sql.split()[0]} {params}: {e}")
+            failed.append(item)
+    return failed
+
+async def report_flushed(bot, pending_deletes, batch, failed):
+    # Пользователю уже ответили об успехе, поэтому о потерянных изменениях сообщаем отдельно
+    for sql, params in batch:
+        if sql is SQL_DELETE_EVENT:
+            event_id, user_id = params
+            pending = pending_deletes.get(user_id)
+            if pending is not None:
+                pending.discard(event_id)
+                if not pending:
+                    del pending_deletes[user_id]
+    
+    for sql, params in failed:
+        if sql is SQL_DELETE_EVENT:
+            event_id, user_id = params
+            text = f"⚠️ Не удалось удалить событие {event_id}, попробуйте ещё раз"
+        else:
+            user_id = params[0]
+            text = "⚠️ Не удалось сохранить событие, добавьте его ещё раз"
+        try:
+            await bot.send_message(chat_id=user_id, text=text)
+        except Exception as e:
+            logger.error(f"Не удалось уведомить пользователя {user_id}: {e}")
+
+async def write_flusher(queue: asyncio.Queue, bot, pending_deletes):
+    loop = asyncio.get_running_loop()
+    stopping = False
+    while not stopping:
+        item = await queue.get()
+        if item is None:
+            break
+        batch = [item]
+        deadline = loop.time() + WRITE_BATCH_DELAY
+        
+        while len(batch) < WRITE_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                stopping = True
+                break
+            batch.append(item)
+        
+        failed = await flush_writes(batch)
+        await report_flushed(bot, pending_deletes, batch, failed)
 
 # --- Обработчики команд ---
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -61,42 +322,45 @@ async def add_event(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return GET_DATETIME
 
 async def get_datetime(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        datetime_str = update.message.text
-        dt = datetime.strptime(datetime_str, "%d.%m.%y %H:%M")
-        context.user_data['datetime'] = datetime_str
-        await update.message.reply_text("✏️ Введите описание события:")
-        return GET_TEXT
-    except ValueError:
-        await update.message.reply_text("❌ Неверный формат! Используйте ДД.ММ.ГГ ЧЧ:ММ")
+    message = update.message
+    dt = parse_datetime(message.text)
+    if dt is None:
+        await message.reply_text("❌ Неверный формат! Используйте ДД.ММ.ГГ ЧЧ:ММ")
         return GET_DATETIME
+    
+    context.user_data['datetime'] = dt.strftime(DB_DATETIME_FORMAT)
+    context.user_data['ts'] = to_timestamp(dt)
+    await message.reply_text("✏️ Введите описание события:")
+    return GET_TEXT
 
 async def get_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data['text'] = update.message.text
-    await update.message.reply_text(
+    message = update.message
+    context.user_data['text'] = message.text
+    await message.reply_text(
         "📎 Прикрепите файл (документ/фото/аудио) или нажмите /skip"
     )
     return GET_FILE
 
 async def get_file_attachment(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    message = update.message
     file_id = file_type = file_name = None
     
-    if update.message.document:
-        file_id = update.message.document.file_id
+    if message.document:
+        file_id = message.document.file_id
         file_type = "document"
-        file_name = update.message.document.file_name
-    elif update.message.photo:
-        file_id = update.message.photo[-1].file_id
+        file_name = message.document.file_name
+    elif message.photo:
+        file_id = message.photo[-1].file_id
         file_type = "photo"
-    elif update.message.audio:
-        file_id = update.message.audio.file_id
+    elif message.audio:
+        file_id = message.audio.file_id
         file_type = "audio"
-        file_name = update.message.audio.file_name
+        file_name = message.audio.file_name
     
     if file_id:
         await save_event(update, context, file_id, file_type, file_name)
     else:
-        await update.message.reply_text("❌ Поддерживаются только документы, фото и аудио")
+        await message.reply_text("❌ Поддерживаются только документы, фото и аудио")
         return GET_FILE
     
     return ConversationHandler.END
@@ -107,49 +371,67 @@ async def skip_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def save_event(update: Update, context: ContextTypes.DEFAULT_TYPE, 
                     file_id=None, file_type=None, file_name=None):
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute(
-            """INSERT INTO events 
-            (user_id, datetime, event_text, file_id, file_type, file_name) 
-            VALUES (?, ?, ?, ?, ?, ?)""",
-            (
-                update.effective_user.id,
-                context.user_data['datetime'],
-                context.user_data['text'],
-                file_id,
-                file_type,
-                file_name
-            )
+    user_id = update.effective_user.id
+    context.bot_data['write_queue'].put_nowait((
+        SQL_INSERT_EVENT,
+        (
+            user_id,
+            context.user_data['datetime'],
+            context.user_data['ts'],
+            context.user_data['text'],
+            file_id,
+            file_type,
+            file_name
         )
+    ))
     msg = "✅ Событие сохранено!" + (" С файлом!" if file_id else "")
     await update.message.reply_text(msg)
 
+def events_page_keyboard(page, has_more):
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"list_page_{page - 1}"))
+    if has_more:
+        navigation.append(InlineKeyboardButton("➡️ Далее", callback_data=f"list_page_{page + 1}"))
+    
+    keyboard = [[InlineKeyboardButton("📥 Скачать файлы", callback_data="get_files")]]
+    if navigation:
+        keyboard.insert(0, navigation)
+    return InlineKeyboardMarkup(keyboard)
+
 async def list_events(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.execute(
-            """SELECT id, datetime, event_text, file_type, file_name 
-            FROM events WHERE user_id = ? ORDER BY datetime""",
-            (update.effective_user.id,)
-        )
-        events = cursor.fetchall()
+    user_id = update.effective_user.id
+    message, shown, has_more = await run_db(_render_events_page, user_id, 0)
     
-    if not events:
+    if message is None:
         await update.message.reply_text("📭 Нет сохраненных событий")
         return
     
-    message = "📋 Ваши события:\n\n"
-    for event_id, dt, text, file_type, file_name in events:
-        message += f"🆔 {event_id}\n⏰ {dt}: {text}\n"
-        if file_type:
-            name = file_name if file_name else file_type
-            message += f"📎 Файл: {name}\n"
-        message += "\n"
-    
-    keyboard = [[InlineKeyboardButton("📥 Скачать файлы", callback_data="get_files")]]
-    
+    # Страницы разной длины: запоминаем, с какого события начинается каждая
+    context.user_data["list_offsets"] = {0: 0, 1: shown}
     await update.message.reply_text(
         message,
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        reply_markup=events_page_keyboard(0, has_more)
+    )
+
+async def handle_list_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    query = update.callback_query
+    await query.answer()
+    
+    page = int(query.data.split('_')[2])
+    offsets = context.user_data.setdefault("list_offsets", {})
+    offset = offsets.get(page, page * EVENTS_PAGE_SIZE)
+    message, shown, has_more = await run_db(_render_events_page, user_id, offset)
+    
+    if message is None:
+        await query.edit_message_text("📭 Нет сохраненных событий")
+        return
+    
+    offsets[page + 1] = offset + shown
+    await query.edit_message_text(
+        text=message,
+        reply_markup=events_page_keyboard(page, has_more)
     )
 
 async def request_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -157,46 +439,42 @@ async def request_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return GET_EVENT_ID
 
 async def get_event_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    message = update.message
+    user_id = update.effective_user.id
     try:
-        event_id = int(update.message.text)
+        event_id = int(message.text)
         
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.execute(
-                """SELECT file_id, file_type, file_name 
-                FROM events WHERE id = ? AND user_id = ?""",
-                (event_id, update.effective_user.id)
-            )
-            file = cursor.fetchone()
+        file = await run_db(_select_file, event_id, user_id)
         
         if not file:
-            await update.message.reply_text("❌ Файл не найден")
+            await message.reply_text("❌ Файл не найден")
             return ConversationHandler.END
         
         file_id, file_type, file_name = file
         caption = f"Файл из события {event_id}" if not file_name else file_name
         
         if file_type == 'document':
-            await update.message.reply_document(
+            await message.reply_document(
                 document=file_id,
                 caption=caption
             )
         elif file_type == 'photo':
-            await update.message.reply_photo(
+            await message.reply_photo(
                 photo=file_id,
                 caption=caption
             )
         elif file_type == 'audio':
-            await update.message.reply_audio(
+            await message.reply_audio(
                 audio=file_id,
                 caption=caption
             )
             
     except ValueError:
-        await update.message.reply_text("❌ Введите числовой ID события")
+        await message.reply_text("❌ Введите числовой ID события")
         return GET_EVENT_ID
     except Exception as e:
         logger.error(f"Ошибка при получении файла: {e}")
-        await update.message.reply_text("⚠️ Ошибка при получении файла")
+        await message.reply_text("⚠️ Ошибка при получении файла")
     
     return ConversationHandler.END
 
@@ -206,54 +484,122 @@ async def handle_file_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await query.message.reply_text("Введите ID события для скачивания файла:")
     return GET_EVENT_ID
 
-async def delete_event(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.execute(
-            "SELECT id, datetime, event_text FROM events WHERE user_id = ? ORDER BY datetime",
-            (update.effective_user.id,)
+async def show_delete_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    offset = context.user_data.get("del_offset", 0)
+    events, has_more = await run_db(_select_delete_page, user_id, offset)
+    context.user_data["delete_candidates"] = events
+    
+    keyboard = [
+        [InlineKeyboardButton(f"{format_timestamp(dt)}: {text[:20]}...", callback_data=f"d{event_id}")]
+        for event_id, (dt, text) in events.items()
+    ]
+    
+    page = offset // DELETE_PAGE_SIZE
+    nav_buttons = []
+    if page > 0:
+        nav_buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"del_page_{page - 1}"))
+    if has_more:
+        nav_buttons.append(InlineKeyboardButton("Вперед ➡️", callback_data=f"del_page_{page + 1}"))
+    if nav_buttons:
+        keyboard.append(nav_buttons)
+    
+    if update.callback_query:
+        if not keyboard:
+            await update.callback_query.edit_message_text("📭 Нет событий для удаления")
+            return
+        await update.callback_query.edit_message_text(
+            "❌ Выберите событие для удаления:",
+            reply_markup=InlineKeyboardMarkup(keyboard)
         )
-        events = cursor.fetchall()
+        return
     
-    if not events:
+    if not keyboard:
         await update.message.reply_text("📭 Нет событий для удаления")
         return
     
-    keyboard = [
-        [InlineKeyboardButton(f"{dt}: {text[:20]}...", callback_data=f"del_{id}")]
-        for id, dt, text in events
-    ]
-    
     await update.message.reply_text(
         "❌ Выберите событие для удаления:",
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
 
+async def delete_event(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data["del_offset"] = 0
+    await show_delete_page(update, context)
+
+async def handle_delete_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    
+    page = int(query.data.split('_')[2])
+    context.user_data["del_offset"] = page * DELETE_PAGE_SIZE
+    await show_delete_page(update, context)
+
 async def confirm_delete(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
     query = update.callback_query
     await query.answer()
     
-    event_id = int(query.data.split('_')[1])
+    # callback_data вида "d<id>"
+    event_id = int(query.data[1:])
     
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.execute(
-            "SELECT datetime, event_text FROM events WHERE id = ?",
-            (event_id,)
-        )
-        dt, text = cursor.fetchone()
-        
-        conn.execute("DELETE FROM events WHERE id = ?", (event_id,))
-        conn.commit()
+    pending_deletes = context.bot_data['pending_deletes']
+    event = context.user_data.get("delete_candidates", {}).pop(event_id, None)
+    if event_id in pending_deletes.get(user_id, ()):
+        # Удаление уже ждёт записи - повторное нажатие ничего не удаляет
+        event = None
+    elif event is None:
+        # Клавиатура из старого сообщения - проверяем событие по БД
+        event = await run_db(_select_event, event_id, user_id)
+    
+    if not event:
+        await query.edit_message_text(text="❌ Событие не найдено", reply_markup=None)
+        return
     
+    pending_deletes.setdefault(user_id, set()).add(event_id)
+    context.bot_data['write_queue'].put_nowait((SQL_DELETE_EVENT, (event_id, user_id)))
+    dt, text = event
     await query.edit_message_text(
-        text=f"🗑️ Событие удалено:\n⏰ {dt}: {text}",
+        text=f"🗑️ Событие удалено:\n⏰ {format_timestamp(dt)}: {text}",
         reply_markup=None
     )
 
 # --- Запуск приложения ---
+async def post_init(application: Application):
+    queue = asyncio.Queue()
+    pending_deletes = {}
+    application.bot_data['write_queue'] = queue
+    application.bot_data['pending_deletes'] = pending_deletes
+    application.bot_data['write_flusher'] = asyncio.create_task(
+        write_flusher(queue, application.bot, pending_deletes)
+    )
+
+async def post_shutdown(application: Application):
+    # None в очереди - сигнал flusher'у записать остаток буфера и завершиться
+    application.bot_data['write_queue'].put_nowait(None)
+    await application.bot_data['write_flusher']
+    await run_db(close_db)
+    DB_POOL.shutdown(wait=True)
+
 def main():
-    init_db()
+    load_dotenv()
+    token = os.getenv("TELEGRAM_BOT_TOKEN")
+    webhook_url = os.getenv("WEBHOOK_URL")
+    webhook_secret = os.getenv("WEBHOOK_SECRET")
+    if webhook_url and not webhook_secret:
+        raise SystemExit("WEBHOOK_SECRET обязателен, если задан WEBHOOK_URL")
+    db_path = str(Path.home() / "telegram_bot_data" / "events.db")
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
     
-    app = Application.builder().token(TOKEN).build()
+    init_db(db_path)
+    
+    app = (
+        Application.builder()
+        .token(token)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     
     # Обработчики команд
     conv_handler_add = ConversationHandler(
@@ -288,9 +634,26 @@ def main():
     app.add_handler(CommandHandler('delete', delete_event))
     app.add_handler(conv_handler_add)
     app.add_handler(conv_handler_file)
-    app.add_handler(CallbackQueryHandler(confirm_delete, pattern='^del_'))
+    app.add_handler(CallbackQueryHandler(confirm_delete, pattern=r'^d\d'))
+    app.add_handler(CallbackQueryHandler(handle_delete_page, pattern='^del_page_'))
+    app.add_handler(CallbackQueryHandler(handle_list_page, pattern='^list_page_'))
     
-    app.run_polling()
+    allowed_updates = [Update.MESSAGE, Update.CALLBACK_QUERY]
+    if webhook_url:
+        app.run_webhook(
+            listen=os.getenv("WEBHOOK_LISTEN", "127.0.0.1"),
+            port=int(os.getenv("WEBHOOK_PORT", "8443")),
+            url_path=token,
+            webhook_url=f"{webhook_url.rstrip('/')}/{token}",
+            secret_token=webhook_secret,
+            allowed_updates=allowed_updates
+        )
+    else:
+        app.run_polling(
+            poll_interval=0.0,
+            timeout=30,
+            allowed_updates=allowed_updates
+        )
 
 if __name__ == '__main__':
     main()